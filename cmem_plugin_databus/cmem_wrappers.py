@@ -1,12 +1,19 @@
 """wrappers around some wrong/impractical cmem functions not deployed yet"""
 
 
+from functools import lru_cache
 from typing import Iterator
 from cmem.cmempy.dp.proxy.graph import _get_graph_uri as cmem_get_graph_uri
 from cmem.cmempy.dp.proxy.graph import get
 from cmem.cmempy.api import request
 
 
+@lru_cache(maxsize=128)
+def _graph_uri(endpoint_id: str, graph: str) -> str:
+    """graph endpoint URI, resolved once per endpoint and graph"""
+    return str(cmem_get_graph_uri(endpoint_id, graph))
+
+
 def post_streamed_bytes(
     graph: str,
     data: Iterator[bytes],
@@ -30,7 +37,7 @@ def post_streamed_bytes(
         requests.Response object
 
     """
-    uri = cmem_get_graph_uri(endpoint_id, graph) + "&replace=" + str(replace).lower()
+    uri = f"{_graph_uri(endpoint_id, graph)}&replace={'true' if replace else 'false'}"
     headers = {"Content-Type": content_type}
     # https://2.python-requests.org/en/master/user/advanced/#streaming-uploads
     response = request(uri, method="POST", headers=headers, data=data, stream=True)
@@ -1,223 +1,242 @@
 """Plugin for loading one file from the databus and write it ino a dataset"""
-from typing import Any, Optional
-
-import requests
-from cmem.cmempy.workspace.projects.resources import get_resources
-from cmem.cmempy.workspace.projects.resources.resource import create_resource
-from cmem_plugin_base.dataintegration.context import (
-    ExecutionContext,
-    ExecutionReport,
-    PluginContext
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from queue import Full, Queue
+from threading import Event, Thread
+from time import monotonic
+from typing import Iterator, Optional
+
+from cmem.cmempy.workspace.projects.resources.resource import (
+    create_resource,
+    delete_resource,
 )
+from cmem_plugin_base.dataintegration.context import ExecutionContext, ExecutionReport
 from cmem_plugin_base.dataintegration.description import Plugin, PluginParameter
 from cmem_plugin_base.dataintegration.plugins import WorkflowPlugin
-from cmem_plugin_base.dataintegration.types import StringParameterType, Autocompletion
 from cmem_plugin_base.dataintegration.utils import setup_cmempy_user_access
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
 
+from cmem_plugin_databus.parameter_types import (
+    DatabusFile,
+    DatabusSearch,
+    FacetSearch,
+    ResourceParameterType,
+)
 from cmem_plugin_databus.utils import (
-    fetch_api_search_result, fetch_facets_options, fetch_databus_files,
+    REPORT_INTERVAL,
+    SESSION,
+    fetch_databus_file_sha256,
+    get_clock,
 )
 
 
-class DatabusSearch(StringParameterType):
-    """Databus Search Type"""
-
-    autocompletion_depends_on_parameters: list[str] = ["databus_base_url"]
-
-    # auto complete for values
-    allow_only_autocompleted_values: bool = True
-    # auto complete for labels
-    autocomplete_value_with_labels: bool = True
-
-    def autocomplete(
-        self,
-        query_terms: list[str],
-        depend_on_parameter_values: list[Any],
-        context: PluginContext,
-    ) -> list[Autocompletion]:
-
-        if not query_terms:
-            label = "Search for Databus artifacts"
-            return [Autocompletion(value="", label=f"{label}")]
-
-        databus_base_url = depend_on_parameter_values[0]
-        result = fetch_api_search_result(
-            databus_base=databus_base_url,
-            url_parameters={
-                "query": " ".join(query_terms),
-                "typeNameWeight": 0,
-                "minRelevance": 20,
-                "maxResults": 25,
-                "typeName": " Artifact"
-            }
-        )
-        return [
-            Autocompletion(
-                value=f"{_.resource}",
-                label=f"{_.label}",
-            )for _ in result
-        ]
-
-
-class FacetSearch(StringParameterType):
-    """Facet Type"""
-
-    autocompletion_depends_on_parameters: list[str] = [
-        "databus_base_url",
-        "databus_artifact"
-    ]
-
-    # auto complete for values
-    allow_only_autocompleted_values: bool = True
-    # auto complete for labels
-    autocomplete_value_with_labels: bool = False
-    #
-
-    def __init__(self, facet_option: str):
-        self.facet_option = facet_option
-
-    def autocomplete(
-        self,
-        query_terms: list[str],
-        depend_on_parameter_values: list[Any],
-        context: PluginContext,
-    ) -> list[Autocompletion]:
-
-        databus_base_url = depend_on_parameter_values[0]
-        databus_document = depend_on_parameter_values[1]
-        facet_options = fetch_facets_options(
-            databus_base=databus_base_url,
-            url_parameters={
-                "type": "artifact",
-                "uri": databus_document
-            }
-        )
-        _format = facet_options[self.facet_option]
-        if self.facet_option == "version":
-            _format = sorted(_format, reverse=True)
-        else:
-            _format = sorted(_format)
-
-        result = [
-                Autocompletion(
-                    value=f"{_}",
-                    label=f"{_}",
-                ) for _ in _format
-            ]
-        if query_terms:
-            result = [_ for _ in result if _.value.find(query_terms[0]) > -1]
-
-        return result
-
-
-class ResourceParameterType(StringParameterType):
-    """Resource parameter type."""
-    allow_only_autocompleted_values: bool = True
-
-    autocomplete_value_with_labels: bool = True
-
-    file_type: Optional[str] = None
-
-    def __init__(self, file_type: Optional[str] = None):
-        """Dataset parameter type."""
-        self.file_type = file_type
-
-    def autocomplete(
-            self,
-            query_terms: list[str],
-            depend_on_parameter_values: list[Any],
-            context: PluginContext,
-    ) -> list[Autocompletion]:
-        setup_cmempy_user_access(context.user)
-        resources = get_resources(context.project_id)
-        result = [
-            Autocompletion(
-                value=f"{_['fullPath']}",
-                label=f"{_['name']}",
-            ) for _ in resources
-        ]
-        if query_terms:
-            result = [_ for _ in result if _.value.find(query_terms[0]) > -1]
-
-        if not result and query_terms:
-            result = [
-                Autocompletion(
-                    value=f"{query_terms[0]}",
-                    label=f"{query_terms[0]} (New resource)"
-                )
-            ]
-
-        return result
-
-
-class DatabusFile(StringParameterType):
-    """Class for DatabusFile"""
-    autocompletion_depends_on_parameters: list[str] = [
-        "databus_base_url",
-        "databus_artifact",
-        "artifact_format",
-        "artifact_version"
-    ]
-
-    # auto complete for values
-    allow_only_autocompleted_values: bool = True
-    # auto complete for labels
-    autocomplete_value_with_labels: bool = False
-
-    def autocomplete(
-            self,
-            query_terms: list[str],
-            depend_on_parameter_values: list[Any],
-            context: PluginContext,
-    ) -> list[Autocompletion]:
-        databus_base_url = depend_on_parameter_values[0]
-        databus_document = depend_on_parameter_values[1]
-        artifact_format = depend_on_parameter_values[2]
-        artifact_version = depend_on_parameter_values[3]
-        result = fetch_databus_files(
-            endpoint=databus_base_url,
-            artifact=databus_document,
-            version=artifact_version,
-            file_format=artifact_format
-        )
-        finalized_result = []
-        for _ in result:
-            variant = _["variant"]["value"] \
-                if not _["variant"]["value"].startswith(", ") \
-                else _["variant"]["value"].replace(", ", "", 1)
-            finalized_result.append(
-                Autocompletion(
-                    value=f"{_['file']['value']}",
-                    label=f'Version={_["version"]["value"]}, '
-                          f'Variant={variant}, '
-                          f'Format={_["format"]["value"]}, '
-                          f'Compression={_["compression"]["value"]}, '
-                          f'Size={_["size"]["value"]} Bytes',
-                )
-            )
-        return finalized_result
-
-
 class ResponseStream:
     """A context manager for streaming the content of an HTTP response in chunks.
 
     This class allows you to stream the content of an HTTP response in manageable chunks
     without loading the entire response into memory at once. It provides an iterable
-    interface to read the response content piece by piece."""
-
-    def __enter__(self):
-        return self._read()
+    interface to read the response content piece by piece. Entering the context
+    returns the chunk iterator, so HTTP clients send the chunks as they are instead
+    of reading a file-like body in small blocks. If an execution context is given,
+    the download progress is reported while the chunks are consumed.
+
+    The response is read by a background thread into a bounded queue, so the
+    download continues while the consumer is busy uploading the previous chunk.
+    If the connection breaks, the download is continued with a range request.
+    Large files are fetched as parallel range requests, if the server supports it."""
+
+    # minimal number of seconds between two progress reports
+    report_interval: float = REPORT_INTERVAL
+    # how often a broken download is continued with a range request
+    max_resumes: int = 3
+    # files of at least this size are downloaded with parallel range requests
+    parallel_threshold: int = 64 * 1024 * 1024
+    # chunk sized ranges being downloaded and chunks waiting in the queue are
+    # bounded together by parallel_downloads (one range is always in flight), with
+    # the chunks in the hands of the download thread and the consumer at most
+    # max(parallel_downloads, queue_size + 1) + 2 chunks are held in memory,
+    # 56 MiB with the defaults and the 8 MiB chunk size of the loader
+    parallel_downloads: int = 4
+
+    def __enter__(self) -> Iterator[bytes]:
+        return self._get_chunks()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+        self.close()
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._get_chunks()
 
-    def __init__(self, response, chunk_size=1048576):
+    def __init__(
+            self,
+            response,
+            chunk_size=1048576,
+            context: Optional[ExecutionContext] = None,
+            queue_size: int = 4
+    ):
         self.response = response
         self.chunk_size = chunk_size
+        self.context = context
+        self._queue: Queue = Queue(maxsize=queue_size)
+        self._closed = Event()
+        # hash of the downloaded bytes, computed by the download thread
+        self._sha256 = hashlib.sha256()
+        self._chunks_read: Optional[Iterator[bytes]] = None
+
+    @property
+    def resumable(self) -> bool:
+        """the server accepts range requests for the response"""
+        # range offsets refer to the encoded bytes, so only plain bodies are resumed,
+        # a resumed download is a partial response, which proves the support
+        headers = self.response.headers
+        return "Content-Encoding" not in headers and (
+            headers.get("Accept-Ranges") == "bytes"
+            or self.response.status_code == 206
+        )
 
-    def _read(self):
-        for _ in self.response.iter_content(chunk_size=self.chunk_size):
-            yield _
+    @property
+    def sha256sum(self) -> str:
+        """hex digest of the bytes downloaded so far"""
+        return self._sha256.hexdigest()
+
+    def close(self) -> None:
+        """stop the download and close the response"""
+        self._closed.set()
+        self.response.close()
+
+    def _get_chunks(self) -> Iterator[bytes]:
+        """the chunk iterator, the download is started on first access"""
+        if self._chunks_read is None:
+            self._chunks_read = self._read()
+        return self._chunks_read
+
+    def _put(self, item) -> bool:
+        """put an item into the queue, give up when the stream was closed"""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _resume(self, offset: int) -> None:
+        """continue a broken download with a range request starting at offset"""
+        url = self.response.url
+        self.response.close()
+        self.response = SESSION.get(
+            url, headers={"Range": f"bytes={offset}-"}, stream=True, timeout=3000
+        )
+        if self.response.status_code != 206:
+            raise ProtocolError(f"Download could not be resumed at byte {offset}")
+
+    def _chunks(self) -> Iterator[bytes]:
+        """yield the response chunks, resuming the download after connection errors"""
+        received = 0
+        resumes = 0
+        while True:
+            try:
+                # read from urllib3 directly, iter_content only re-chunks the data
+                for chunk in self.response.raw.stream(
+                    self.chunk_size, decode_content=True
+                ):
+                    received += len(chunk)
+                    yield chunk
+                return
+            except (ProtocolError, ReadTimeoutError):
+                if not self.resumable or resumes >= self.max_resumes:
+                    raise
+                resumes += 1
+                self._resume(received)
+
+    def _fetch_range(self, url: str, start: int, end: int) -> bytes:
+        """download the bytes from start to end (inclusive) with a range request"""
+        with SESSION.get(
+            url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=3000
+        ) as resp:
+            if resp.status_code != 206:
+                raise ProtocolError(f"Range {start}-{end} could not be downloaded")
+            content: bytes = resp.content
+        if len(content) != end - start + 1:
+            raise ProtocolError(f"Range {start}-{end} is incomplete")
+        return content
+
+    def _ranged_chunks(self, size: int) -> Iterator[bytes]:
+        """download chunk sized parts concurrently, yield them in order
+
+        The first part is read from the initial response, the following parts
+        are fetched with range requests."""
+        url = self.response.url
+        offsets = iter(range(self.chunk_size, size, self.chunk_size))
+        executor = ThreadPoolExecutor(max_workers=self.parallel_downloads)
+        pending: deque = deque()
+
+        def top_up() -> None:
+            """submit range requests while the downloading and queued parts are
+            less than parallel_downloads, at least one range stays in flight"""
+            while not pending or (
+                len(pending) + self._queue.qsize() < self.parallel_downloads
+            ):
+                start = next(offsets, None)
+                if start is None:
+                    return
+                end = min(start + self.chunk_size, size) - 1
+                pending.append(executor.submit(self._fetch_range, url, start, end))
+
+        try:
+            top_up()
+            first = self.response.raw.read(self.chunk_size, decode_content=True)
+            self.response.close()
+            if len(first) != min(self.chunk_size, size):
+                raise ProtocolError("The first part could not be downloaded")
+            yield first
+            top_up()
+            while pending:
+                part = pending.popleft().result()
+                top_up()
+                yield part
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def _fill(self) -> None:
+        """read the response into the queue, finished by None or an exception"""
+        size = int(self.response.headers.get("Content-Length", 0))
+        if self.resumable and size >= self.parallel_threshold:
+            chunks = self._ranged_chunks(size)
+        else:
+            chunks = self._chunks()
+        try:
+            for chunk in chunks:
+                self._sha256.update(chunk)
+                if not self._put(chunk):
+                    return
+        except Exception as error:  # pylint: disable=broad-except
+            self._put(error)
+            return
+        self._put(None)
+
+    def _read(self) -> Iterator[bytes]:
+        Thread(target=self._fill, daemon=True).start()
+        received = 0
+        counter = 0
+        last_report = monotonic()
+        while (chunk := self._queue.get()) is not None:
+            if isinstance(chunk, Exception):
+                raise chunk
+            received += len(chunk)
+            now = monotonic()
+            if self.context is not None and now - last_report >= self.report_interval:
+                self.context.report.update(
+                    ExecutionReport(
+                        entity_count=received // 1000000,
+                        operation="wait",
+                        operation_desc=f"Downloading File {get_clock(counter)}",
+                    )
+                )
+                counter += 1
+                last_report = now
+            yield chunk
 
 
 @Plugin(
@@ -274,7 +293,7 @@ class ResponseStream:
             name="chunk_size",
             label="Chunk Size",
             description="Chunksize during up/downloading the graph.",
-            default_value=1048576,
+            default_value=8388608,
             advanced=True,
         ),
     ],
@@ -291,7 +310,7 @@ class SimpleDatabusLoadingPlugin(WorkflowPlugin):
             artifact_version: str = "",
             databus_file_id: str = "",
             target_file: str = "",
-            chunk_size: int = 1048576
+            chunk_size: int = 8388608
     ) -> None:
         self.databus_url = databus_base_url
         self.databus_file_id = databus_file_id
@@ -308,7 +327,7 @@ class SimpleDatabusLoadingPlugin(WorkflowPlugin):
         setup_cmempy_user_access(context.user)
         self.log.info(f"Downloading file from {self.databus_file_id}")
 
-        databus_file_resp = requests.get(
+        databus_file_resp = SESSION.get(
             self.databus_file_id,
             allow_redirects=True,
             stream=True,
@@ -323,23 +342,52 @@ class SimpleDatabusLoadingPlugin(WorkflowPlugin):
             )
             return
 
+        # the published checksum is looked up while the file is transferred
+        executor = ThreadPoolExecutor(max_workers=1)
+        sha256_future = executor.submit(
+            fetch_databus_file_sha256, self.databus_url, self.databus_file_id
+        )
+        executor.shutdown(wait=False)
+
+        stream = ResponseStream(
+            databus_file_resp, chunk_size=self.chunk_size, context=context
+        )
         upload_response = create_resource(
             project_name=context.task.project_id(),
             resource_name=self.target_file,
-            file_resource=ResponseStream(databus_file_resp),
+            file_resource=stream,
             replace=True
         )
-        if upload_response.status_code < 400:
+        try:
+            expected_sha256 = sha256_future.result()
+        except Exception as error:  # pylint: disable=broad-except
+            # the checksum is an optional check, the download does not depend on it
+            self.log.warning(f"Could not fetch the sha256sum of the file: {error}")
+            expected_sha256 = None
+        if upload_response.status_code >= 400:
             context.report.update(
                 ExecutionReport(
-                    operation_desc="Download Successful ✓",
-                    entity_count=1
+                    operation_desc="Download Failed ❌",
+                    error=upload_response.text
                 )
             )
-        else:
+        elif expected_sha256 and expected_sha256 != stream.sha256sum:
+            # the resource was already replaced, the corrupt file must not stay
+            delete_resource(
+                project_name=context.task.project_id(),
+                resource_name=self.target_file,
+            )
             context.report.update(
                 ExecutionReport(
                     operation_desc="Download Failed ❌",
-                    error=upload_response.text
+                    error=f"checksum mismatch, expected sha256sum {expected_sha256}"
+                    f" but got {stream.sha256sum}, the resource was deleted",
+                )
+            )
+        else:
+            context.report.update(
+                ExecutionReport(
+                    operation_desc="Download Successful ✓",
+                    entity_count=1
                 )
             )
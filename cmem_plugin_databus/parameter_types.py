@@ -0,0 +1,215 @@
+"""Parameter types with autocompletion for the Databus plugins"""
+from itertools import islice
+from typing import Any, Iterable, Optional
+
+from cmem.cmempy.workspace.projects.resources import get_resources
+from cmem_plugin_base.dataintegration.context import PluginContext
+from cmem_plugin_base.dataintegration.types import StringParameterType, Autocompletion
+from cmem_plugin_base.dataintegration.utils import setup_cmempy_user_access
+
+from cmem_plugin_databus.utils import (
+    fetch_api_search_result,
+    fetch_facets_options,
+    fetch_databus_files,
+    ttl_cache,
+)
+
+MAX_AUTOCOMPLETIONS = 50
+
+
+def _filter_values(values: Iterable[str], query_terms: list[str]) -> list[str]:
+    """case-insensitive substring filter, capped to MAX_AUTOCOMPLETIONS values"""
+    if not query_terms:
+        return list(values)
+    query = query_terms[0].lower()
+    return list(
+        islice((_ for _ in values if query in _.lower()), MAX_AUTOCOMPLETIONS)
+    )
+
+
+def _fetch_resources(project_id: str) -> dict[str, str]:
+    """names of the project resources by full path"""
+    return {
+        resource["fullPath"]: resource["name"]
+        for resource in get_resources(project_id)
+    }
+
+
+@ttl_cache(maxsize=32, ttl=5)
+def _fetch_user_resources(project_id: str, user_uri: str) -> dict[str, str]:
+    """names of the project resources by full path, cached per project and user"""
+    # the user is only part of the cache key, the access is set up by the caller
+    _ = user_uri
+    return _fetch_resources(project_id)
+
+
+def _get_resources(project_id: str, user_uri: Optional[str]) -> dict[str, str]:
+    """names of the project resources by full path, cached for known users"""
+    # system and unauthenticated contexts can not be told apart, so they are
+    # never served from a shared cache entry
+    if not user_uri:
+        return _fetch_resources(project_id)
+    return _fetch_user_resources(project_id, user_uri)
+
+
+class DatabusSearch(StringParameterType):
+    """Databus Search Type"""
+
+    autocompletion_depends_on_parameters: list[str] = ["databus_base_url"]
+
+    # auto complete for values
+    allow_only_autocompleted_values: bool = True
+    # auto complete for labels
+    autocomplete_value_with_labels: bool = True
+
+    def autocomplete(
+        self,
+        query_terms: list[str],
+        depend_on_parameter_values: list[Any],
+        context: PluginContext,
+    ) -> list[Autocompletion]:
+
+        if not query_terms:
+            label = "Search for Databus artifacts"
+            return [Autocompletion(value="", label=f"{label}")]
+
+        databus_base_url = depend_on_parameter_values[0]
+        result = fetch_api_search_result(
+            databus_base=databus_base_url,
+            url_parameters={
+                "query": " ".join(query_terms),
+                "typeNameWeight": 0,
+                "minRelevance": 20,
+                "maxResults": 25,
+                "typeName": " Artifact"
+            }
+        )
+        return [
+            Autocompletion(
+                value=f"{_.resource}",
+                label=f"{_.label}",
+            )for _ in result
+        ]
+
+
+class FacetSearch(StringParameterType):
+    """Facet Type"""
+
+    autocompletion_depends_on_parameters: list[str] = [
+        "databus_base_url",
+        "databus_artifact"
+    ]
+
+    # auto complete for values
+    allow_only_autocompleted_values: bool = True
+    # auto complete for labels
+    autocomplete_value_with_labels: bool = False
+    #
+
+    def __init__(self, facet_option: str):
+        self.facet_option = facet_option
+
+    def autocomplete(
+        self,
+        query_terms: list[str],
+        depend_on_parameter_values: list[Any],
+        context: PluginContext,
+    ) -> list[Autocompletion]:
+
+        databus_base_url = depend_on_parameter_values[0]
+        databus_document = depend_on_parameter_values[1]
+        facet_options = fetch_facets_options(
+            databus_base=databus_base_url,
+            url_parameters={
+                "type": "artifact",
+                "uri": databus_document
+            }
+        )
+        _format = _filter_values(facet_options[self.facet_option], query_terms)
+        return [
+                Autocompletion(
+                    value=f"{_}",
+                    label=f"{_}",
+                ) for _ in _format
+            ]
+
+
+class ResourceParameterType(StringParameterType):
+    """Resource parameter type."""
+    allow_only_autocompleted_values: bool = True
+
+    autocomplete_value_with_labels: bool = True
+
+    file_type: Optional[str] = None
+
+    def __init__(self, file_type: Optional[str] = None):
+        """Dataset parameter type."""
+        self.file_type = file_type
+
+    def autocomplete(
+            self,
+            query_terms: list[str],
+            depend_on_parameter_values: list[Any],
+            context: PluginContext,
+    ) -> list[Autocompletion]:
+        setup_cmempy_user_access(context.user)
+        resources = _get_resources(context.project_id, context.user.user_uri())
+        result = [
+            Autocompletion(
+                value=f"{_}",
+                label=f"{resources[_]}",
+            ) for _ in _filter_values(resources, query_terms)
+        ]
+
+        if not result and query_terms:
+            result = [
+                Autocompletion(
+                    value=f"{query_terms[0]}",
+                    label=f"{query_terms[0]} (New resource)"
+                )
+            ]
+
+        return result
+
+
+class DatabusFile(StringParameterType):
+    """Class for DatabusFile"""
+    autocompletion_depends_on_parameters: list[str] = [
+        "databus_base_url",
+        "databus_artifact",
+        "artifact_format",
+        "artifact_version"
+    ]
+
+    # auto complete for values
+    allow_only_autocompleted_values: bool = True
+    # auto complete for labels
+    autocomplete_value_with_labels: bool = False
+
+    def autocomplete(
+            self,
+            query_terms: list[str],
+            depend_on_parameter_values: list[Any],
+            context: PluginContext,
+    ) -> list[Autocompletion]:
+        databus_base_url = depend_on_parameter_values[0]
+        databus_document = depend_on_parameter_values[1]
+        artifact_format = depend_on_parameter_values[2]
+        artifact_version = depend_on_parameter_values[3]
+        result = fetch_databus_files(
+            endpoint=databus_base_url,
+            artifact=databus_document,
+            version=artifact_version,
+            file_format=artifact_format
+        )
+        return [
+            Autocompletion(
+                value=_["file"]["value"],
+                label=f'Version={_["version"]["value"]}, '
+                      f'Variant={_["variant"]["value"].removeprefix(", ")}, '
+                      f'Format={_["format"]["value"]}, '
+                      f'Compression={_["compression"]["value"]}, '
+                      f'Size={_["size"]["value"]} Bytes',
+            )
+            for _ in result
+        ]
@@ -2,9 +2,11 @@
 import re
 import hashlib
 import json
+import zlib
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 
 from cmem.cmempy.workspace.tasks import get_task
 from cmem_plugin_base.dataintegration.context import ExecutionContext, ExecutionReport
@@ -18,44 +20,58 @@ from databusclient import create_distribution, createDataset, deploy
 from cmem_plugin_databus.utils import (
     WebDAVException,
     WebDAVHandler,
-    get_clock,
     MissingMetadataException,
+    clear_databus_cache,
 )
 from cmem_plugin_databus.cmem_wrappers import get_streamed
 
 NS = "http://dalicc.net/licenselibrary/"
 
 LICENSES = OrderedDict(
-    {
-        f"{NS}AcademicFreeLicense30": "Academic Free License 3.0",
-        f"{NS}AdaptivePublicLicense10": "Adaptive Public License 1.0",
-        f"{NS}ApplePublicSourceLicense20": "Apple Public Source License 2.0",
-        f"{NS}ArtisticLicense20": "Artistic License 2.0",
-        f"{NS}AttributionAssuranceLicense": "Attribution Assurance License",
-        f"{NS}BoostSoftwareLicense10": "Boost Software License 1.0",
-        f"{NS}CeaCnrsInriaLogicielLibreLicenseVersion21": (
-            "Cea Cnrs Inria Logiciel Libre License, version 2.1"
+    [
+        (f"{NS}AcademicFreeLicense30", "Academic Free License 3.0"),
+        (f"{NS}AdaptivePublicLicense10", "Adaptive Public License 1.0"),
+        (f"{NS}ApplePublicSourceLicense20", "Apple Public Source License 2.0"),
+        (f"{NS}ArtisticLicense20", "Artistic License 2.0"),
+        (f"{NS}AttributionAssuranceLicense", "Attribution Assurance License"),
+        (f"{NS}BoostSoftwareLicense10", "Boost Software License 1.0"),
+        (
+            f"{NS}CeaCnrsInriaLogicielLibreLicenseVersion21",
+            "Cea Cnrs Inria Logiciel Libre License, version 2.1",
         ),
-        f"{NS}CommonDevelopmentAndDistributionLicense10": (
-            "Common Development and Distribution License 1.0"
+        (
+            f"{NS}CommonDevelopmentAndDistributionLicense10",
+            "Common Development and Distribution License 1.0",
         ),
-        f"{NS}CommonPublicAttributionLicenseVersion10": (
-            "Common Public Attribution License Version 1.0"
+        (
+            f"{NS}CommonPublicAttributionLicenseVersion10",
+            "Common Public Attribution License Version 1.0",
         ),
-        f"{NS}ComputerAssociatesTrustedOpenSourceLicense11": (
-            "Computer Associates Trusted Open Source License 1.1"
+        (
+            f"{NS}ComputerAssociatesTrustedOpenSourceLicense11",
+            "Computer Associates Trusted Open Source License 1.1",
         ),
-    }
+    ]
 )
 
 
-def validate_dataset_artifact_uri(uri: str):
-    """validate dataset artifact uri"""
-    pattern = r"^https?://[^/]+/[^/]+/[^/]+/[^/]+/$"
+# https://{DATABUS_BASE_URI}/{PUBLISHER}/{GROUP}/{ARTIFACT}/
+ARTIFACT_URI_PATTERN = re.compile(r"^https?://[^/]+/[^/]+/[^/]+/[^/]+/?$")
+
+# keys are the Databus compression identifiers, they are the file suffix as well
+COMPRESSIONS = OrderedDict(
+    [
+        ("none", "No compression"),
+        ("gz", "gzip"),
+    ]
+)
+# the fast deflate levels keep the compression ahead of typical upload speeds
+GZIP_LEVEL = 3
 
-    if re.match(pattern, uri):
-        return True
-    return False
+
+def validate_dataset_artifact_uri(uri: str) -> bool:
+    """validate dataset artifact uri"""
+    return ARTIFACT_URI_PATTERN.match(uri) is not None
 
 
 @Plugin(
@@ -112,7 +128,16 @@ The knowledge graph will be deployed as a turtle file to the Databus.
             name="chunk_size",
             label="Chunk Size",
             description="Chunksize during up/downloading the graph",
-            default_value=1048576,
+            default_value=4194304,
+            advanced=True,
+        ),
+        PluginParameter(
+            name="compression",
+            label="Compression",
+            description="Compress the graph before it is uploaded to the Databus."
+            " Turtle usually shrinks to a fraction of its size.",
+            param_type=ChoiceParameterType(COMPRESSIONS),
+            default_value="none",
             advanced=True,
         ),
     ],
@@ -131,12 +156,15 @@ class DatabusDeployPlugin(WorkflowPlugin):
         source_dataset: str,
         cvs: str,
         chunk_size: int,
+        compression: str = "none",
     ) -> None:
         # pylint: disable=too-many-arguments
-        if validate_dataset_artifact_uri(dataset_artifact_uri):
+        if not validate_dataset_artifact_uri(dataset_artifact_uri):
             raise ValueError("The specified dataset artifact uri is not valid")
         self.dataset_artifact_uri = dataset_artifact_uri
-        databus_base, user, _, _ = self.__get_identifier_from_artifact()
+        # the artifact URI does not change, so it is split only once
+        self.artifact_identifier = self.__get_identifier_from_artifact()
+        databus_base, user, _, _ = self.artifact_identifier
         self.webdav_handler = WebDAVHandler(
             databus_base=databus_base + "/", user=user, api_key=api_key
         )
@@ -147,7 +175,12 @@ class DatabusDeployPlugin(WorkflowPlugin):
         for content_variant in cvs.split(","):
             key, value = content_variant.split("=")
             self.cvs[key] = value
+        # in the given order, it is part of the published file name
+        self.cv_string = "_".join(f"{k}={v}" for k, v in self.cvs.items())
         self.fileformat = "ttl"
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression}")
+        self.compression = compression
         self.source_dataset = source_dataset
         self.chunk_size = chunk_size
 
@@ -164,7 +197,7 @@ class DatabusDeployPlugin(WorkflowPlugin):
         task_id = self.source_dataset
         metadata_dict = get_task(project=project_id, task=task_id)
 
-        self.log.info("Fetched " + str(metadata_dict))
+        self.log.debug(f"Fetched {metadata_dict}")
 
         try:
             uri: str = metadata_dict["data"]["parameters"]["graph"]["value"]
@@ -182,6 +215,51 @@ class DatabusDeployPlugin(WorkflowPlugin):
 
         return str(uri), str(title), str(abstract), str(description)
 
+    def _upload_graph(
+        self, graph_uri: str, file_target_path: str, context: ExecutionContext
+    ) -> Tuple[str, int]:
+        """stream the graph from CMEM to the WebDAV, hashing it on the way
+
+        Returns the sha256sum and the length of the uploaded file."""
+        # create the WebDAV directories while the graph request is answered by CMEM
+        executor = ThreadPoolExecutor(max_workers=1)
+        dirs_future = executor.submit(
+            self.webdav_handler.create_dirs, file_target_path.rsplit("/", 1)[0]
+        )
+        executor.shutdown(wait=False)
+
+        sha256 = hashlib.sha256()
+        content_length = 0
+
+        def hashed(chunks: Iterator[bytes]) -> Iterator[bytes]:
+            nonlocal content_length
+            for chunk in chunks:
+                sha256.update(chunk)
+                content_length += len(chunk)
+                yield chunk
+
+        try:
+            with get_streamed(graph_uri, accept="text/turtle") as resp:
+                # the directories are needed before the upload starts
+                dirs_future.result()
+                chunks = resp.raw.stream(self.chunk_size, decode_content=True)
+                if self.compression == "gz":
+                    chunks = _gzip_chunks(chunks)
+                upload_resp = self.webdav_handler.upload_file_with_context(
+                    path=file_target_path,
+                    data=hashed(chunks),
+                    context=context,
+                    chunk_size=self.chunk_size,
+                )
+        except Exception:
+            # the error of the failed step is raised, the directory creation is
+            # only waited for, its result was taken or does not matter any more
+            wait([dirs_future])
+            raise
+        if upload_resp.status_code >= 400:
+            raise WebDAVException(upload_resp)
+        return sha256.hexdigest(), content_length
+
     def execute(
         self, inputs=(), context: ExecutionContext = ExecutionContext()
     ) -> None:
@@ -201,6 +279,15 @@ class DatabusDeployPlugin(WorkflowPlugin):
         context.report.update(
             ExecutionReport(operation_desc=f"Started deploy of version {self.version}")
         )
+        databus_base, user, group, artifact = self.artifact_identifier
+
+        file_target_path = (
+            f"{group}/{artifact}/{self.version}/"
+            f"{artifact}_{self.cv_string}.{self.fileformat}"
+        )
+        if self.compression != "none":
+            file_target_path += f".{self.compression}"
+
         setup_cmempy_super_user_access()
         # deploy metadata to databus
         try:
@@ -211,60 +298,29 @@ class DatabusDeployPlugin(WorkflowPlugin):
             context.report.update(ExecutionReport(error=str(mm_exception)))
             return
 
-        databus_base, user, group, artifact = self.__get_identifier_from_artifact()
-
         self.log.info(f"Info about graph: {title} ({graph_uri})")
 
-        # generating some required strings
-        cv_string = "_".join([f"{k}={v}" for k, v in self.cvs.items()])
-
-        file_target_path = (
-            f"{group}/{artifact}/{self.version}/"
-            f"{artifact}_{cv_string}.{self.fileformat}"
-        )
-
-        # fetch data
-        data: bytearray = bytearray()
-        with get_streamed(graph_uri, accept="text/turtle") as resp:
-            for _, chunk in enumerate(resp.iter_content(chunk_size=self.chunk_size)):
-                data += bytearray(chunk)
-                desc = f"Get graph stream {get_clock(_)}"
-                context.report.update(
-                    ExecutionReport(
-                        entity_count=len(data) // 1000000,
-                        operation="wait",
-                        operation_desc=desc,
-                    )
-                )
-
-        sha256sum = hashlib.sha256(bytes(data)).hexdigest()
-        content_length = len(data)
-        summary.append(("File sha256sum", str(sha256sum)))
-        summary.append(("File size (bytes)", str(content_length)))
-
         context.report.update(
             ExecutionReport(operation_desc=f"Uploading file to {file_target_path}")
         )
-        upload_resp = self.webdav_handler.upload_file_with_context(
-            path=file_target_path,
-            data=bytes(data),
-            context=context,
-            create_parent_dirs=True,
-            chunk_size=self.chunk_size,
+        sha256sum, content_length = self._upload_graph(
+            graph_uri, file_target_path, context
         )
-        if upload_resp.status_code >= 400:
-            raise WebDAVException(upload_resp)
 
         context.report.update(
             ExecutionReport(operation_desc="WebDAV Upload Successful ✓")
         )
 
+        summary.append(("File sha256sum", str(sha256sum)))
+        summary.append(("File size (bytes)", str(content_length)))
+
         version_id = f"{databus_base}/{user}/{group}/{artifact}/{self.version}"
         file_url = f"{self.webdav_handler.dav_base}{file_target_path}"
         distrib = create_distribution(
             url=file_url,
             cvs=self.cvs,
             file_format=self.fileformat,
+            compression=None if self.compression == "none" else self.compression,
             sha256_length_tuple=(sha256sum, content_length),
         )
         self.log.info(f"Distrib String: {distrib}")
@@ -278,14 +334,22 @@ class DatabusDeployPlugin(WorkflowPlugin):
         )
         self.log.info(f"Submitted Dataset to Databus: {json.dumps(dataset)}")
         deploy(dataset, self.api_key)
+        # the new version has to show up in the autocompletion
+        clear_databus_cache()
         context.report.update(ExecutionReport(operation_desc="Deployment Successful ✓"))
 
 
 def _generate_abstract_from_description(description: str) -> str:
-    first_point = description.find(".")
-    if first_point == -1:
-        first_sentence = description
-    else:
-        first_sentence = description[0 : first_point + 1]
-
-    return first_sentence
+    first_sentence, point, _ = description.partition(".")
+    return first_sentence + point
+
+
+def _gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """gzip compress a stream of chunks"""
+    # wbits 31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -1,7 +1,25 @@
 """Utils for handling the DBpedia Databus"""
+import json
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Dict, Iterator, List, Optional, Any
-from urllib.parse import urlencode
+from functools import wraps
+from threading import Lock
+from time import monotonic
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+    cast,
+)
+from urllib.parse import quote_plus, unquote, urlencode, urlsplit
+from xml.etree import ElementTree  # nosec
 
 import requests
 from cmem_plugin_base.dataintegration.context import (
@@ -11,7 +29,57 @@ from cmem_plugin_base.dataintegration.context import (
 )
 from cmem_plugin_base.dataintegration.types import Autocompletion, StringParameterType
 from requests import RequestException
-from SPARQLWrapper import JSON, SPARQLWrapper
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# shared HTTP session, keeps connections to the Databus alive between calls
+# and retries idempotent requests on transient server errors
+SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    ),
+)
+SESSION.mount("https://", _ADAPTER)
+SESSION.mount("http://", _ADAPTER)
+
+# prefix header shared by the Databus SPARQL queries
+SPARQL_PREFIXES = """PREFIX dct: <http://purl.org/dc/terms/>
+PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX dataid: <http://dataid.dbpedia.org/ns/core#>
+PREFIX dcat: <http://www.w3.org/ns/dcat#>
+PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+"""
+
+# query templates of the load_* functions, only the identifiers are filled in
+_ACCOUNTS_QUERY = SPARQL_PREFIXES + """SELECT DISTINCT ?acc WHERE {
+  ?acc a foaf:PersonalProfileDocument .
+} """
+_GROUPS_QUERY = SPARQL_PREFIXES + """SELECT DISTINCT ?group WHERE {{
+?dataset a dataid:Dataset .
+?dataset dct:publisher <{publisher_uri}> .
+?dataset dataid:group ?group .}}"""
+_ARTIFACTS_QUERY = SPARQL_PREFIXES + """SELECT DISTINCT ?artifact WHERE {{
+?dataset dataid:group <{group_id}> .
+?dataset dataid:artifact ?artifact .}}"""
+_VERSIONS_QUERY = SPARQL_PREFIXES + """SELECT DISTINCT ?version WHERE {{
+?dataset dataid:artifact <{artifact_id}> .
+?dataset dataid:version ?version .}}"""
+_FILES_QUERY = SPARQL_PREFIXES + """SELECT DISTINCT ?file WHERE {{
+?dataset dataid:version <{version_id}> .
+?dataset dcat:distribution ?dist .
+?dist dataid:file ?file. }}"""
+
+_FILE_SHA256_QUERY = """PREFIX databus: <https://dataid.dbpedia.org/databus#>
+SELECT DISTINCT ?sha256sum WHERE {{
+?distribution databus:file <{file_id}> .
+?distribution databus:sha256sum ?sha256sum . }}"""
 
 
 class WebDAVException(Exception):
@@ -34,24 +102,105 @@ class MissingMetadataException(Exception):
         )
 
 
-def get_clock(counter: int) -> str:
-    """returns a clock symbol"""
-    clock = {
-        0: "🕛",
-        1: "🕐",
-        2: "🕑",
-        3: "🕓",
-        4: "🕔",
-        5: "🕕",
-        6: "🕖",
-        7: "🕗",
-        8: "🕘",
-        9: "🕚",
-    }
-    return clock[int(repr(counter)[-1])]
+# minimal number of seconds between two progress updates of an execution report
+REPORT_INTERVAL = 0.25
 
+_CLOCKS = ("🕛", "🕐", "🕑", "🕒", "🕓", "🕔", "🕕", "🕖", "🕗", "🕘", "🕙", "🕚")
 
-@dataclass
+
+def get_clock(counter: int) -> str:
+    """returns a clock symbol"""
+    return _CLOCKS[counter % len(_CLOCKS)]
+
+
+def _freeze(value: Any) -> Any:
+    """hashable representation of (nested) dicts, lists and tuples"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(_)) for key, _ in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(_) for _ in value)
+    return value
+
+
+def _copy_containers(value: Any) -> Any:
+    """copy of the (nested) lists and dicts of a value, other objects are shared"""
+    if isinstance(value, dict):
+        return {key: _copy_containers(_) for key, _ in value.items()}
+    if isinstance(value, list):
+        return [_copy_containers(_) for _ in value]
+    return value
+
+
+# all functions decorated with ttl_cache, cleared by clear_databus_cache
+_CACHED_FUNCTIONS: List[Callable] = []
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def ttl_cache(maxsize: int = 256, ttl: float = 300) -> Callable[[F], F]:
+    """least recently used cache, whose entries expire after ttl seconds
+
+    The structure of a Databus (accounts, groups, artifacts, ...) rarely changes
+    during an editing session, so autocompletion requests can be answered from
+    memory instead of asking the remote endpoint on every keystroke.
+    Concurrent calls with the same arguments wait for a single computation.
+    Every caller gets its own copy of cached lists and dicts.
+    """
+
+    def decorator(func: F) -> F:
+        cache: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        key_locks: dict = {}
+        lock = Lock()
+
+        def lookup(key: Any) -> Optional[tuple[float, Any]]:
+            """the cached entry of key if it is not expired, must hold lock"""
+            entry = cache.get(key)
+            if entry is not None and monotonic() - entry[0] < ttl:
+                cache.move_to_end(key)
+                return entry
+            return None
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = (_freeze(args), _freeze(kwargs))
+            with lock:
+                entry = lookup(key)
+                if entry is not None:
+                    return _copy_containers(entry[1])
+                key_lock = key_locks.setdefault(key, Lock())
+            with key_lock:
+                with lock:
+                    # another thread may have computed the result in the meantime
+                    entry = lookup(key)
+                if entry is not None:
+                    return _copy_containers(entry[1])
+                try:
+                    result = func(*args, **kwargs)
+                    with lock:
+                        cache[key] = (monotonic(), result)
+                        cache.move_to_end(key)
+                        while len(cache) > maxsize:
+                            cache.popitem(last=False)
+                finally:
+                    with lock:
+                        key_locks.pop(key, None)
+            return _copy_containers(result)
+
+        wrapper.cache_clear = cache.clear  # type: ignore[attr-defined]
+        _CACHED_FUNCTIONS.append(wrapper)
+        return cast(F, wrapper)
+
+    return decorator
+
+
+def clear_databus_cache() -> None:
+    """drop all cached lookups, e.g. after publishing to a Databus"""
+    for function in _CACHED_FUNCTIONS:
+        function.cache_clear()  # type: ignore[attr-defined]
+
+
+@dataclass(slots=True, frozen=True)
 class DatabusSearchResult:
     """Databus Search Result"""
 
@@ -71,6 +220,7 @@ def result_from_json_dict(json_dict: Dict[str, List[str]]) -> DatabusSearchResul
     )
 
 
+@ttl_cache(ttl=60)
 def fetch_api_search_result(
         databus_base: str,
         url_parameters: Optional[dict] = None
@@ -82,116 +232,93 @@ def fetch_api_search_result(
 
     request_uri = f"{databus_base}/api/search?{encoded_query_str}"
 
-    json_resp = requests.get(request_uri, timeout=30).json()
+    json_resp = SESSION.get(request_uri, timeout=30).json()
 
-    result = []
+    return [result_from_json_dict(res) for res in json_resp["docs"]]
 
-    for res in json_resp["docs"]:
-        result.append(result_from_json_dict(res))
 
-    return result
+# URL-encoded queries above this length are sent with POST
+MAX_GET_QUERY_LENGTH = 8000
+
+
+def fetch_sparql_bindings(endpoint: str, query: str) -> List[Dict[str, Any]]:
+    """Sends a SELECT query to the given endpoint and returns the result bindings"""
+    headers = {"Accept": "application/sparql-results+json"}
+    if len(quote_plus(query)) <= MAX_GET_QUERY_LENGTH:
+        resp = SESSION.get(
+            endpoint, params={"query": query}, headers=headers, stream=True, timeout=30
+        )
+    else:
+        # long queries do not fit into the request line of most servers
+        headers["Content-Type"] = "application/sparql-query"
+        resp = SESSION.post(
+            endpoint,
+            data=query.encode("utf-8"),
+            headers=headers,
+            stream=True,
+            timeout=30,
+        )
+    with resp:
+        resp.raise_for_status()
+        # json.load reads the complete body, parsing the raw stream only avoids
+        # the additional copies of resp.content and resp.text
+        resp.raw.decode_content = True
+        bindings: List[Dict[str, Any]] = json.load(resp.raw)["results"]["bindings"]
+    return bindings
 
 
 def fetch_query_result_by_key(endpoint: str, query: str, key: str) -> List[str]:
     """Sends a query to the given endpoint and collects all results
     of a key in a list"""
-    sparql_service = SPARQLWrapper(endpoint)
-    sparql_service.setQuery(query)
-    sparql_service.setReturnFormat(JSON)
-
-    query_results = sparql_service.query().convert()
-
-    # just to make mypy stop complaining
-    assert isinstance(query_results, dict)  # nosec
-
-    try:
-        results = list(
-            map(
-                lambda binding: str(binding[key]["value"]),
-                query_results["results"]["bindings"],
-            )
-        )
-    except KeyError:
-        results = []
-
-    return results
+    bindings = fetch_sparql_bindings(endpoint, query)
+    # values of SPARQL JSON results are strings already, unbound keys are skipped
+    return [binding[key]["value"] for binding in bindings if key in binding]
 
 
+@ttl_cache()
 def load_accounts(sparql_endpoint: str) -> List[str]:
     """Load available publishers from the databus.
     Only accounts, not all publishers defined"""
-    query = """PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX foaf: <http://xmlns.com/foaf/0.1/>
-
-SELECT DISTINCT ?acc WHERE {
-  ?acc a foaf:PersonalProfileDocument .
-} """
-
-    return fetch_query_result_by_key(sparql_endpoint, query, "acc")
+    return fetch_query_result_by_key(sparql_endpoint, _ACCOUNTS_QUERY, "acc")
 
 
+@ttl_cache()
 def load_groups(sparql_endpoint: str, publisher_uri: str) -> List[str]:
     """Load groups for a given publisher ID. CARE: #this is expected at the end!"""
-    query = (
-        "PREFIX dct: <http://purl.org/dc/terms/>\n"
-        + "PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>\n"
-        + "PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>\n"
-        + "PREFIX dataid: <http://dataid.dbpedia.org/ns/core#>\n"
-        + "SELECT DISTINCT ?group WHERE {\n"
-        + "?dataset a dataid:Dataset .\n"
-        + f"?dataset dct:publisher <{publisher_uri}> .\n"
-        "?dataset dataid:group ?group .}"
-    )
+    query = _GROUPS_QUERY.format(publisher_uri=publisher_uri)
     return fetch_query_result_by_key(sparql_endpoint, query, "group")
 
 
+@ttl_cache()
 def load_artifacts(sparql_endpoint: str, group_id: str) -> List[str]:
     """Load artifacts for a given group ID"""
-    query = (
-        "PREFIX dct: <http://purl.org/dc/terms/>\n"
-        + "PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>\n"
-        + "PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>\n"
-        + "PREFIX dataid: <http://dataid.dbpedia.org/ns/core#>\n"
-        + "SELECT DISTINCT ?artifact WHERE {\n"
-        + f"?dataset dataid:group <{group_id}> .\n"
-        + "?dataset dataid:artifact ?artifact .}"
-    )
-
+    query = _ARTIFACTS_QUERY.format(group_id=group_id)
     return fetch_query_result_by_key(sparql_endpoint, query, "artifact")
 
 
+@ttl_cache()
 def load_versions(sparql_endpoint: str, artifact_id: str) -> List[str]:
     """Load versions for a given artifact ID"""
-    query = (
-        "PREFIX dct: <http://purl.org/dc/terms/>\n"
-        + "PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>\n"
-        + "PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>\n"
-        + "PREFIX dataid: <http://dataid.dbpedia.org/ns/core#>\n"
-        + "SELECT DISTINCT ?version WHERE {\n"
-        + f"?dataset dataid:artifact <{artifact_id}> .\n"
-        + "?dataset dataid:version ?version .}"
-    )
-
+    query = _VERSIONS_QUERY.format(artifact_id=artifact_id)
     return fetch_query_result_by_key(sparql_endpoint, query, "version")
 
 
+@ttl_cache()
 def load_files(sparql_endpoint: str, version_id: str) -> List[str]:
     """Load files for a given version ID"""
-    query = (
-        "PREFIX dct: <http://purl.org/dc/terms/>\n"
-        + "PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>\n"
-        + "PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>\n"
-        + "PREFIX dataid: <http://dataid.dbpedia.org/ns/core#>\n"
-        + "PREFIX dcat: <http://www.w3.org/ns/dcat#>\n"
-        + "SELECT DISTINCT ?file WHERE {\n"
-        + f"?dataset dataid:version <{version_id}> .\n"
-        + "?dataset dcat:distribution ?dist .\n"
-        + "?dist dataid:file ?file. }"
-    )
+    query = _FILES_QUERY.format(version_id=version_id)
     return fetch_query_result_by_key(sparql_endpoint, query, "file")
 
 
+def fetch_databus_file_sha256(endpoint: str, file_id: str) -> Optional[str]:
+    """fetch the published sha256sum of a databus file, None if there is none"""
+    query = _FILE_SHA256_QUERY.format(file_id=file_id)
+    results = fetch_query_result_by_key(
+        f"{endpoint.rstrip('/')}/sparql", query, "sha256sum"
+    )
+    return results[0] if results else None
+
+
 class DatabusFileAutocomplete(StringParameterType):
     """Class for autocompleting identifiers from an arbitrary databus"""
 
@@ -216,7 +343,7 @@ class DatabusFileAutocomplete(StringParameterType):
         query_no_http = query_str.replace("https://", "")
         parts = query_no_http.rstrip("/ ").rsplit("/", 5)
 
-        endpoint = "https://" + parts[0] + "/sparql"
+        endpoint = f"https://{parts[0]}/sparql"
 
         normalized_querystr = query_str[0 : query_str.rfind("/")]
 
@@ -227,7 +354,7 @@ class DatabusFileAutocomplete(StringParameterType):
             if len(parts) == 2:
                 # when it's the account return groups
                 # needs #this appended for publisher id
-                return load_groups(endpoint, normalized_querystr + "#this")
+                return load_groups(endpoint, f"{normalized_querystr}#this")
             if len(parts) == 3:
                 # when it's a group -> return artifacts
                 return load_artifacts(endpoint, normalized_querystr)
@@ -237,7 +364,8 @@ class DatabusFileAutocomplete(StringParameterType):
             if len(parts) == 5:
                 # when it's a version -> return files
                 return load_files(endpoint, normalized_querystr)
-        except RequestException:
+        except (RequestException, ValueError, KeyError):
+            # unreachable endpoints and unexpected answers, e.g. HTML error pages
             return [query_str]
         return [query_str]
 
@@ -254,52 +382,82 @@ class WebDAVHandler:
     def __init__(self, databus_base: str, user: str, api_key: str):
         self.dav_base = databus_base + f"dav/{user}/"
         self.api_key = api_key
-
-    def check_existence(self, path: str) -> bool:
-        """check if path is available"""
-        try:
-            resp = requests.head(url=f"{self.dav_base}{path}", timeout=4)
-        except requests.RequestException:
-            return False
-
-        return bool(resp.status_code == 405)
-
-    def create_dir(
-        self, path: str, session: Optional[requests.Session] = None
-    ) -> requests.Response:
+        self.session = requests.Session()
+        self.session.headers.update({"X-API-KEY": f"{self.api_key}"})
+        # share the connection pools of the module session
+        self.session.mount("https://", _ADAPTER)
+        self.session.mount("http://", _ADAPTER)
+        # directories known to exist, they are not checked again
+        self.created_dirs: set[str] = set()
+
+    def create_dir(self, path: str) -> requests.Response:
         """create directory"""
+        return self.session.request("MKCOL", url=f"{self.dav_base}{path}", timeout=30)
 
-        if session is None:
-            session = requests.Session()
+    def probe_tree(self, root: str) -> Optional[set[str]]:
+        """list all existing directories below root with a single PROPFIND
 
-        req = requests.Request(
-            method="MKCOL",
-            url=f"{self.dav_base}{path}",
-            headers={"X-API-KEY": f"{self.api_key}"},
-        )
-        resp = session.send(req.prepare())
-        return resp
+        Returns the paths relative to the WebDAV base (with trailing slash) or
+        None, if the server does not answer the PROPFIND request.
+        """
+        try:
+            resp = self.session.request(
+                "PROPFIND",
+                url=f"{self.dav_base}{root}",
+                headers={"Depth": "infinity"},
+                stream=True,
+                timeout=30,
+            )
+        except requests.RequestException:
+            return None
+        with resp:
+            if resp.status_code == 404:
+                return set()
+            if resp.status_code != 207:
+                return None
+            resp.raw.decode_content = True
+            base_path = unquote(urlsplit(self.dav_base).path)
+            existing = set()
+            # the multistatus document comes from the configured Databus
+            for _, element in ElementTree.iterparse(resp.raw):  # nosec
+                if element.tag != "{DAV:}href" or not element.text:
+                    continue
+                href = unquote(urlsplit(element.text.strip()).path)
+                if href.startswith(base_path) and href.endswith("/"):
+                    existing.add(href[len(base_path):])
+        return existing
 
     def create_dirs(self, path: str) -> List[requests.Response]:
         """create directories"""
 
         dirs = path.split("/")
+        prefixes = ["/".join(dirs[: i + 1]) + "/" for i in range(len(dirs))]
+        if prefixes[-1] in self.created_dirs:
+            return []
+        # usually only the leaf is missing, 409 means a parent is missing as well
+        resp = self.create_dir(prefixes[-1])
+        if resp.status_code in [200, 201, 405]:
+            self.created_dirs.update(prefixes)
+            return [resp]
+
+        # without PROPFIND support every prefix is created, MKCOL answers 405
+        # for existing directories, which is cheaper than checking them first
+        existing = self.probe_tree(prefixes[0]) or set()
         responses = []
-        current_path = ""
-        for directory in dirs:
-            current_path = current_path + directory + "/"
-            if not self.check_existence(current_path):
+        for current_path in prefixes:
+            if current_path not in existing:
                 resp = self.create_dir(current_path)
                 responses.append(resp)
                 if resp.status_code not in [200, 201, 405]:
                     raise WebDAVException(resp)
+        self.created_dirs.update(prefixes)
 
         return responses
 
     def upload_file_with_context(
         self,
         path: str,
-        data: bytes,
+        data: Union[bytes, bytearray, IO[bytes], Iterable[bytes]],
         context: ExecutionContext,
         chunk_size: int,
         create_parent_dirs: bool = False,
@@ -320,9 +478,8 @@ class WebDAVHandler:
                 raise WebDAVException(responses[-1])
 
         # TODO: check why mypy has a problem with this
-        resp = requests.put(
+        resp = self.session.put(
             url=f"{self.dav_base}{path}",
-            headers={"X-API-KEY": f"{self.api_key}"},
             data=context_data_generator,  # type: ignore
             stream=True,
             timeout=3000,
@@ -331,17 +488,20 @@ class WebDAVHandler:
         return resp
 
     def upload_file(
-        self, path: str, data: bytes, create_parent_dirs: bool = False
+        self,
+        path: str,
+        data: Union[bytes, IO[bytes]],
+        create_parent_dirs: bool = False,
     ) -> requests.Response:
-        """upload data in bytes to a path, optionally creating parent dirs."""
+        """upload data in bytes or from a binary file object to a path,
+        optionally creating parent dirs. File objects are streamed."""
 
         if create_parent_dirs:
             dirpath = path.rsplit("/", 1)[0]
             self.create_dirs(dirpath)
 
-        resp = requests.put(
+        resp = self.session.put(
             url=f"{self.dav_base}{path}",
-            headers={"X-API-KEY": f"{self.api_key}"},
             data=data,
             timeout=3000,
         )
@@ -349,24 +509,51 @@ class WebDAVHandler:
         return resp
 
 
+def _iter_chunks(
+    data: Union[bytes, bytearray, IO[bytes], Iterable[bytes]], chunksize: int
+) -> Iterator[bytes]:
+    """chunks of a buffer, a binary file object or an iterable of chunks"""
+    if hasattr(data, "read"):
+        yield from iter(lambda: data.read(chunksize), b"")  # type: ignore[union-attr]
+        return
+    if not isinstance(data, (bytes, bytearray)):
+        # already chunked, e.g. a streamed download
+        yield from data
+        return
+    # slice a view, so only one chunk at a time is copied out of the buffer
+    view = memoryview(data)
+    for offset in range(0, len(view), chunksize):
+        yield bytes(view[offset : offset + chunksize])
+
+
 def byte_iterator_context_update(
-    data: bytes, context: ExecutionContext, chunksize: int, desc: str
+    data: Union[bytes, bytearray, IO[bytes], Iterable[bytes]],
+    context: ExecutionContext,
+    chunksize: int,
+    desc: str,
 ) -> Iterator[bytes]:
     """update Execution report"""
-    for i, chunk in enumerate(
-        [data[i : i + chunksize] for i in range(0, len(data), chunksize)]
-    ):
-        op_desc = f"{desc} {get_clock(i)}"
-        context.report.update(
-            ExecutionReport(
-                entity_count=(i * chunksize) // 1000000,
-                operation="wait",
-                operation_desc=op_desc,
+    last_report = 0.0
+    counter = 0
+    sent = 0
+    for chunk in _iter_chunks(data, chunksize):
+        now = monotonic()
+        if now - last_report >= REPORT_INTERVAL:
+            op_desc = f"{desc} {get_clock(counter)}"
+            counter += 1
+            context.report.update(
+                ExecutionReport(
+                    entity_count=sent // 1000000,
+                    operation="wait",
+                    operation_desc=op_desc,
+                )
             )
-        )
+            last_report = now
+        sent += len(chunk)
         yield chunk
 
 
+@ttl_cache(ttl=60)
 def fetch_facets_options(
         databus_base: str,
         url_parameters: Optional[dict] = None
@@ -379,17 +566,22 @@ def fetch_facets_options(
         "Content-Type": "application/json"
     }
     request_uri = f"{databus_base}/app/utils/facets?{encoded_query_str}"
-    json_resp = requests.get(request_uri, headers=headers, timeout=30).json()
+    json_resp = SESSION.get(request_uri, headers=headers, timeout=30).json()
 
+    # sorted once here, the result is cached and shared by all facet searches
     result = {
-        "version": json_resp["http://purl.org/dc/terms/hasVersion"]["values"],
-        "format":
+        "version": sorted(
+            json_resp["http://purl.org/dc/terms/hasVersion"]["values"], reverse=True
+        ),
+        "format": sorted(
             json_resp["https://dataid.dbpedia.org/databus#formatExtension"]["values"]
+        )
     }
 
     return result
 
 
+@ttl_cache(ttl=60)
 def fetch_databus_files(endpoint: str, artifact: str, version: str, file_format: str):
     """fetch databus file name based of artifact, version and format on a given
     databus instance"""
@@ -402,19 +594,19 @@ PREFIX databus: <https://dataid.dbpedia.org/databus#>
 SELECT DISTINCT ?file ?version ?artifact ?license ?size ?format ?compression
  (GROUP_CONCAT(DISTINCT ?var; SEPARATOR=', ') AS ?variant) ?preview WHERE
 {{
+    # the fixed artifact and format are bound up front, so the endpoint can
+    # restrict the distributions before the optional joins
+    VALUES (?artifact ?format) {{ (<{artifact}> '{file_format}') }}
     GRAPH ?g
     {{
-        ?dataset databus:artifact <{artifact}> .
-        {{ ?distribution <http://purl.org/dc/terms/hasVersion> '{version}' . }}
-        {{ ?distribution
-         <https://dataid.dbpedia.org/databus#formatExtension> '{file_format}' . }}
+        ?dataset databus:artifact ?artifact .
         ?dataset dcat:distribution ?distribution .
-        ?distribution databus:file ?file .
+        ?distribution dct:hasVersion '{version}' .
         ?distribution databus:formatExtension ?format .
+        ?distribution databus:file ?file .
         ?distribution databus:compression ?compression .
         ?dataset dct:license ?license .
         ?dataset dct:hasVersion ?version .
-        ?dataset databus:artifact ?artifact .
         OPTIONAL
          {{ ?distribution ?p ?var. ?p rdfs:subPropertyOf databus:contentVariant . }}
         OPTIONAL {{ ?distribution dcat:byteSize ?size . }}
@@ -422,12 +614,4 @@ SELECT DISTINCT ?file ?version ?artifact ?license ?size ?format ?compression
 }}
 GROUP BY ?file ?version ?artifact ?license ?size ?format ?compression ?preview"""
 
-    endpoint = endpoint+"/sparql"
-    sparql_service = SPARQLWrapper(endpoint)
-    sparql_service.setQuery(query)
-    sparql_service.setReturnFormat(JSON)
-
-    query_results = sparql_service.query().convert()
-    # just to make mypy stop complaining
-    assert isinstance(query_results, dict)  # nosec
-    return query_results["results"]["bindings"]  # nosec
+    return fetch_sparql_bindings(f"{endpoint}/sparql", query)
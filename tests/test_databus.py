@@ -1,6 +1,21 @@
 """Plugin tests."""
+import io
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+
 import pytest
-from cmem_plugin_databus.utils import DatabusFileAutocomplete
+from cmem_plugin_base.dataintegration.context import ExecutionContext, ReportContext
+from cmem_plugin_databus import utils
+from cmem_plugin_databus.utils import (
+    DatabusFileAutocomplete,
+    WebDAVHandler,
+    byte_iterator_context_update,
+    clear_databus_cache,
+    fetch_sparql_bindings,
+    get_clock,
+    ttl_cache,
+)
 
 # def test_plugin():
 #     plugin = SimpleDatabusLoadingPlugin(
@@ -30,5 +45,214 @@ def test_fetch_results():
         assert_correct_result_sizes(uri, expected_path_size)
 
 
+def test_ttl_cache():
+    calls = []
+
+    @ttl_cache(maxsize=2, ttl=60)
+    def square(value: int) -> int:
+        calls.append(value)
+        return value * value
+
+    assert square(2) == 4
+    assert square(2) == 4
+    assert calls == [2]
+    square(3)
+    square(4)
+    # 2 was the least recently used entry and got evicted
+    assert square(2) == 4
+    assert calls == [2, 3, 4, 2]
+    square.cache_clear()
+    square(4)
+    assert calls == [2, 3, 4, 2, 4]
+
+    @ttl_cache()
+    def count(parameters: dict) -> int:
+        calls.append(parameters)
+        return len(parameters)
+
+    assert count({"a": 1, "b": 2}) == count({"b": 2, "a": 1}) == 2
+    assert calls[-1] == {"a": 1, "b": 2}
+    assert len(calls) == 6
+    clear_databus_cache()
+    count({"a": 1, "b": 2})
+    assert len(calls) == 7
+
+
+def test_ttl_cache_keys_and_copies():
+    """test that positional and keyword arguments do not collide and that
+    cached results can not be changed by callers"""
+
+    @ttl_cache()
+    def arguments(*args, **kwargs) -> dict:
+        return {"args": list(args), "kwargs": kwargs}
+
+    assert arguments("a", ("k", "v")) == {"args": ["a", ("k", "v")], "kwargs": {}}
+    assert arguments("a", k="v") == {"args": ["a"], "kwargs": {"k": "v"}}
+
+    result = arguments("b")
+    result["args"].append("changed")
+    result["kwargs"]["k"] = "changed"
+    assert arguments("b") == {"args": ["b"], "kwargs": {}}
+
+
+def test_ttl_cache_concurrent_calls():
+    """test that concurrent calls with the same arguments are computed once"""
+    calls = []
+
+    @ttl_cache()
+    def slow(value: int) -> int:
+        calls.append(value)
+        sleep(0.1)
+        return value
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(slow, [1] * 8)) == [1] * 8
+    assert calls == [1]
+
+
+PROPFIND_RESPONSE = b"""<?xml version="1.0" encoding="utf-8"?>
+<d:multistatus xmlns:d="DAV:">
+  <d:response><d:href>/dav/user/group/</d:href></d:response>
+  <d:response><d:href>/dav/user/group/artifact/</d:href></d:response>
+  <d:response><d:href>/dav/user/group/artifact/file.ttl</d:href></d:response>
+</d:multistatus>"""
+
+
+class FakePropfindResponse:
+    """streamed PROPFIND response"""
+
+    status_code = 207
+
+    def __init__(self):
+        self.raw = io.BytesIO(PROPFIND_RESPONSE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeSession:
+    """session answering every request with a PROPFIND response"""
+
+    def request(self, *args, **kwargs):
+        return FakePropfindResponse()
+
+
+def test_webdav_probe_tree():
+    handler = WebDAVHandler("https://databus.example.org/", "user", "key")
+    handler.session = FakeSession()
+    assert handler.probe_tree("group/") == {"group/", "group/artifact/"}
+
+
+class FakeMkcolSession(FakeSession):
+    """session answering MKCOL requests with the given status codes"""
+
+    def __init__(self, *status_codes: int):
+        self.status_codes = list(status_codes)
+        self.created: list[str] = []
+
+    def request(self, method, url, **kwargs):
+        if method != "MKCOL":
+            return super().request(method, url, **kwargs)
+        self.created.append(url.rsplit("/dav/user/", 1)[1])
+        return FakeMkcolResponse(self.status_codes.pop(0))
+
+
+@dataclass
+class FakeMkcolResponse:
+    """MKCOL response"""
+
+    status_code: int
+
+
+def test_webdav_create_dirs():
+    """test that directories are created optimistically from the leaf"""
+    handler = WebDAVHandler("https://databus.example.org/", "user", "key")
+    handler.session = FakeMkcolSession(201)
+    handler.create_dirs("group/artifact/version")
+    assert handler.session.created == ["group/artifact/version/"]
+    # known directories are not created again
+    handler.create_dirs("group/artifact/version")
+    assert handler.session.created == ["group/artifact/version/"]
+
+    # missing parents are looked up and created top down
+    handler = WebDAVHandler("https://databus.example.org/", "user", "key")
+    handler.session = FakeMkcolSession(409, 201, 201)
+    handler.create_dirs("group/artifact/version/sub")
+    assert handler.session.created == [
+        "group/artifact/version/sub/",
+        "group/artifact/version/",
+        "group/artifact/version/sub/",
+    ]
+
+
+def test_get_clock():
+    assert get_clock(0) == "🕛"
+    assert get_clock(3) == get_clock(15) == get_clock(1203) == "🕒"
+    assert len({get_clock(_) for _ in range(100)}) == 12
+
+
 def test_dummy():
     assert 1 == 1
+
+
+def test_byte_iterator_context_update():
+    """test chunking of an upload buffer"""
+    context = ExecutionContext()
+    context.report = ReportContext()
+    data = bytearray(b"0123456789")
+    chunks = list(byte_iterator_context_update(data, context, 4, "Uploading"))
+    assert chunks == [b"0123", b"4567", b"89"]
+    assert all(isinstance(_, bytes) for _ in chunks)
+    chunks = byte_iterator_context_update(io.BytesIO(data), context, 4, "Uploading")
+    assert list(chunks) == [b"0123", b"4567", b"89"]
+    chunks = byte_iterator_context_update(iter([b"012", b"3"]), context, 4, "Up")
+    assert list(chunks) == [b"012", b"3"]
+
+
+class FakeSparqlResponse(FakePropfindResponse):
+    """streamed SPARQL JSON response"""
+
+    status_code = 200
+
+    def __init__(  # pylint: disable=super-init-not-called
+        self, body: bytes = b'{"results": {"bindings": [{"s": {"value": "x"}}]}}'
+    ):
+        self.raw = io.BytesIO(body)
+
+    def raise_for_status(self):
+        pass
+
+
+def test_fetch_sparql_bindings(monkeypatch):
+    """test that long queries are sent with POST"""
+    methods = []
+
+    def get(url, **kwargs):
+        methods.append("GET")
+        return FakeSparqlResponse()
+
+    def post(url, data, **kwargs):
+        methods.append("POST")
+        assert kwargs["headers"]["Content-Type"] == "application/sparql-query"
+        return FakeSparqlResponse()
+
+    monkeypatch.setattr(utils.SESSION, "get", get)
+    monkeypatch.setattr(utils.SESSION, "post", post)
+    bindings = fetch_sparql_bindings("https://x/sparql", "SELECT")
+    assert bindings == [{"s": {"value": "x"}}]
+    fetch_sparql_bindings("https://x/sparql", "SELECT" + " " * 9000)
+    assert methods == ["GET", "POST"]
+
+
+@pytest.mark.parametrize("body", [b"<html>Bad Gateway</html>", b'{"head": {}}'])
+def test_fetch_results_by_uri_invalid_response(monkeypatch, body):
+    """test that unexpected SPARQL answers fall back to the query string"""
+    clear_databus_cache()
+    monkeypatch.setattr(
+        utils.SESSION, "get", lambda url, **kwargs: FakeSparqlResponse(body)
+    )
+    query = "https://databus.example.org/user/"
+    assert DatabusFileAutocomplete.fetch_results_by_uri(query) == [query]
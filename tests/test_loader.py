@@ -1,13 +1,25 @@
+import hashlib
 import io
-from dataclasses import dataclass
+from time import sleep
+from types import SimpleNamespace
 
 import pytest
 from cmem.cmempy.workspace.projects.project import make_new_project, delete_project
 from cmem.cmempy.workspace.projects.resources.resource import resource_exist, \
     create_resource
+from cmem_plugin_base.dataintegration.context import ExecutionReport, ReportContext
+from urllib3.exceptions import ProtocolError
+from urllib3.util.request import body_to_chunks
 
+from cmem_plugin_databus import loader, parameter_types
 from cmem_plugin_databus.loader import SimpleDatabusLoadingPlugin, DatabusSearch, \
-    ResourceParameterType, FacetSearch, DatabusFile
+    ResourceParameterType, FacetSearch, DatabusFile, ResponseStream
+from cmem_plugin_databus.parameter_types import (
+    MAX_AUTOCOMPLETIONS,
+    _filter_values,
+    _get_resources,
+)
+from cmem_plugin_databus.utils import clear_databus_cache
 from .utils import needs_cmem, TestExecutionContext, TestPluginContext
 
 DATABUS_BASE_URL = "https://databus.dbpedia.org"
@@ -18,6 +30,9 @@ DATABUS_FILE = (
     f"{DATABUS_BASE_URL}/cmempydeveloper/CorporateMemory/"
     f"Documentation/{DOCUMENT_VERSION}/Documentation.md"
 )
+# parameter values the facet and file autocompletions depend on
+DOCUMENT_DEPENDENCIES = (DATABUS_BASE_URL, DATABUS_DOCUMENT)
+FILE_DEPENDENCIES = DOCUMENT_DEPENDENCIES + (DOCUMENT_FORMAT, DOCUMENT_VERSION)
 
 
 def get_autocomplete_values(
@@ -33,13 +48,67 @@ def get_autocomplete_values(
         x.value
         for x in parameter.autocomplete(
             query_terms=query_terms,
-            depend_on_parameter_values=depend_on_parameter_values,
+            depend_on_parameter_values=list(depend_on_parameter_values),
             context=context
         )
     ]
 
 
-@pytest.fixture(name="project")
+class FakeRaw:
+    """minimal stand-in for urllib3.HTTPResponse"""
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.position = 0
+
+    def read(self, amt=None, decode_content=None):
+        """read the next amt bytes"""
+        _ = decode_content
+        end = len(self.content) if amt is None else self.position + amt
+        data = self.content[self.position:end]
+        self.position += len(data)
+        return data
+
+    def stream(self, amt, decode_content=None):
+        """yield the content in chunks"""
+        _ = decode_content
+        for i in range(0, len(self.content), amt):
+            yield self.content[i:i + amt]
+
+
+class BrokenRaw(FakeRaw):
+    """raw response whose connection breaks after the first chunk"""
+
+    def stream(self, amt, decode_content=None):
+        """yield one chunk, then fail"""
+        yield self.content[:amt]
+        raise ProtocolError("Connection broken")
+
+
+class FakeResponse:
+    """minimal stand-in for a streamed requests.Response"""
+
+    url = "https://databus.example.org/file.ttl"
+
+    def __init__(self, content: bytes, status_code: int = 200, raw=None):
+        self.content = content
+        self.raw = raw if raw else FakeRaw(content)
+        self.status_code = status_code
+        self.headers: dict = {}
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """close the response"""
+        self.closed = True
+
+
+@pytest.fixture(name="project", scope="module")
 def project():
     """Provides the DI build project incl. assets."""
     project_name = 'databus_sample_project'
@@ -48,25 +117,25 @@ def project():
     delete_project(project_name)
 
 
+@pytest.fixture(name="default_context", scope="module")
+def default_context():
+    """plugin context shared by the tests without a project"""
+    return TestPluginContext()
+
+
 @pytest.fixture(name="resource")
 def resource(project):
     """setup json resource"""
     _resource_name = "sample_test.txt"
-    create_resource(
-        project_name=project,
-        resource_name=_resource_name,
-        file_resource=io.StringIO("SAMPLE CONTENT"),
-        replace=True
-    )
-
-    @dataclass
-    class FixtureDate:
-        """fixture dataclass"""
-        project_name = project
-        resource_name = _resource_name
-
-    _ = FixtureDate()
-    yield _
+    # the project is shared by the module, the resource is uploaded only once
+    if not resource_exist(project_name=project, resource_name=_resource_name):
+        create_resource(
+            project_name=project,
+            resource_name=_resource_name,
+            file_resource=io.BytesIO(b"SAMPLE CONTENT"),
+            replace=True
+        )
+    yield SimpleNamespace(project_name=project, resource_name=_resource_name)
 
 
 @needs_cmem
@@ -89,19 +158,19 @@ def test_databus_load(project):
 
 
 @needs_cmem
-def test_databus_search_auto_complete():
+def test_databus_search_auto_complete(default_context):
     parameter = DatabusSearch()
     assert '' in get_autocomplete_values(
         parameter,
         [],
         depend_on_parameter_values=[],
-        context=TestPluginContext())
+        context=default_context)
 
     assert len(get_autocomplete_values(
         parameter,
         ['NOTFOUND'],
         depend_on_parameter_values=[DATABUS_BASE_URL],
-        context=TestPluginContext())) == 0
+        context=default_context)) == 0
 
 
 @needs_cmem
@@ -135,101 +204,56 @@ def test_resource_parameter_type_completion(resource):
 
 
 @needs_cmem
-def test_facet_search_auto_complete():
+def test_facet_search_auto_complete(default_context):
     parameter = FacetSearch(facet_option='format')
     assert DOCUMENT_FORMAT in get_autocomplete_values(
         parameter,
         [],
-        depend_on_parameter_values=[
-            DATABUS_BASE_URL,
-            DATABUS_DOCUMENT
-        ],
-        context=TestPluginContext())
+        depend_on_parameter_values=DOCUMENT_DEPENDENCIES,
+        context=default_context)
 
     assert len(get_autocomplete_values(
         parameter,
         ['NOTFOUND'],
-        depend_on_parameter_values=[
-            DATABUS_BASE_URL,
-            DATABUS_DOCUMENT
-        ],
-        context=TestPluginContext())) == 0
+        depend_on_parameter_values=DOCUMENT_DEPENDENCIES,
+        context=default_context)) == 0
 
     parameter = FacetSearch(facet_option='version')
-    assert DOCUMENT_VERSION in get_autocomplete_values(
+    versions = get_autocomplete_values(
         parameter,
         [],
-        depend_on_parameter_values=[
-            DATABUS_BASE_URL,
-            DATABUS_DOCUMENT
-        ],
-        context=TestPluginContext())
+        depend_on_parameter_values=DOCUMENT_DEPENDENCIES,
+        context=default_context)
+    assert DOCUMENT_VERSION in versions
+    assert len(versions) == 2
     assert DOCUMENT_VERSION not in get_autocomplete_values(
         parameter,
         ["23.02"],
-        depend_on_parameter_values=[
-            DATABUS_BASE_URL,
-            DATABUS_DOCUMENT
-        ],
-        context=TestPluginContext())
-    assert len(
-        get_autocomplete_values(
-            parameter,
-            [],
-            depend_on_parameter_values=[
-                DATABUS_BASE_URL,
-                DATABUS_DOCUMENT
-            ],
-            context=TestPluginContext()
-        )
-    ) == 2
+        depend_on_parameter_values=DOCUMENT_DEPENDENCIES,
+        context=default_context)
     assert len(get_autocomplete_values(
         parameter,
         ['NOTFOUND'],
-        depend_on_parameter_values=[
-            DATABUS_BASE_URL,
-            DATABUS_DOCUMENT
-        ],
-        context=TestPluginContext())) == 0
+        depend_on_parameter_values=DOCUMENT_DEPENDENCIES,
+        context=default_context)) == 0
 
 
 @needs_cmem
-def test_databus_file_auto_complete():
+def test_databus_file_auto_complete(default_context):
     parameter = DatabusFile()
-    assert DATABUS_FILE in get_autocomplete_values(
+    files = get_autocomplete_values(
         parameter,
         [],
-        depend_on_parameter_values=[
-            DATABUS_BASE_URL,
-            DATABUS_DOCUMENT,
-            DOCUMENT_FORMAT,
-            DOCUMENT_VERSION
-        ],
-        context=TestPluginContext())
-    assert len(
-        get_autocomplete_values(
-            parameter,
-            [],
-            depend_on_parameter_values=[
-                DATABUS_BASE_URL,
-                DATABUS_DOCUMENT,
-                DOCUMENT_FORMAT,
-                DOCUMENT_VERSION
-            ],
-            context=TestPluginContext()
-        )
-    ) == 1
+        depend_on_parameter_values=FILE_DEPENDENCIES,
+        context=default_context)
+    assert DATABUS_FILE in files
+    assert len(files) == 1
     assert len(
         get_autocomplete_values(
             parameter,
             ["ADSLASD"],
-            depend_on_parameter_values=[
-                DATABUS_BASE_URL,
-                DATABUS_DOCUMENT,
-                DOCUMENT_FORMAT,
-                DOCUMENT_VERSION
-            ],
-            context=TestPluginContext()
+            depend_on_parameter_values=FILE_DEPENDENCIES,
+            context=default_context
         )
     ) == 1
     assert len(
@@ -242,6 +266,165 @@ def test_databus_file_auto_complete():
                 "NOTFOUND",
                 DOCUMENT_VERSION
             ],
-            context=TestPluginContext()
+            context=default_context
         )
     ) == 0
+
+
+def test_response_stream():
+    """test that the response stream yields the complete content"""
+    content = b"SAMPLE CONTENT" * 1000
+    response = FakeResponse(content)
+    stream = ResponseStream(response, chunk_size=100)
+    with stream as chunks:
+        assert b"".join(chunks) == content
+    assert stream.sha256sum == hashlib.sha256(content).hexdigest()
+    assert response.closed
+
+
+def test_response_stream_upload_chunks():
+    """test that an upload of the stream sends the downloaded chunks unsplit"""
+    content = b"SAMPLE CONTENT" * 1000
+    with ResponseStream(FakeResponse(content), chunk_size=1000) as stream:
+        chunks = list(body_to_chunks(stream, method="PUT", blocksize=16).chunks)
+    assert len(chunks) == 14
+    assert b"".join(chunks) == content
+
+
+def test_response_stream_resume(monkeypatch):
+    """test that a broken download is continued with a range request"""
+    content = b"SAMPLE CONTENT" * 1000
+    response = FakeResponse(content, raw=BrokenRaw(content))
+    response.headers = {"Accept-Ranges": "bytes"}
+    requested_ranges = []
+
+    def resume(url, headers, **kwargs):
+        _ = url, kwargs
+        requested_ranges.append(headers["Range"])
+        return FakeResponse(content[100:], status_code=206)
+
+    monkeypatch.setattr(loader.SESSION, "get", resume)
+    with ResponseStream(response, chunk_size=100) as stream:
+        assert b"".join(stream) == content
+    assert requested_ranges == ["bytes=100-"]
+
+
+def test_response_stream_parallel_ranges(monkeypatch):
+    """test that large files are downloaded with ordered, bounded range requests"""
+    content = bytes(range(256)) * 100
+    response = FakeResponse(content)
+    response.headers = {"Accept-Ranges": "bytes", "Content-Length": str(len(content))}
+    requested_starts = []
+
+    def get_range(url, headers, **kwargs):
+        _ = url, kwargs
+        start, end = headers["Range"].removeprefix("bytes=").split("-")
+        requested_starts.append(int(start))
+        return FakeResponse(content[int(start):int(end) + 1], status_code=206)
+
+    monkeypatch.setattr(loader.SESSION, "get", get_range)
+    monkeypatch.setattr(ResponseStream, "parallel_threshold", 1000)
+    with ResponseStream(response, chunk_size=1000) as chunks:
+        assert next(chunks) == content[:1000]
+        # the consumer is busy, only a bounded number of ranges is fetched
+        sleep(0.2)
+        assert len(requested_starts) <= ResponseStream.parallel_downloads + 2
+        assert next(chunks) + b"".join(chunks) == content[1000:]
+    # the first part is taken from the initial response
+    assert sorted(requested_starts) == list(range(1000, len(content), 1000))
+
+
+def test_filter_values():
+    """test case-insensitive and capped autocompletion filter"""
+    values = [f"Version-{_}" for _ in range(100)]
+    assert _filter_values(values, []) == values
+    assert _filter_values(values, ["version-1"])[:2] == ["Version-1", "Version-10"]
+    assert len(_filter_values(values, ["version"])) == MAX_AUTOCOMPLETIONS
+    assert not _filter_values(values, ["NOTFOUND"])
+
+
+class RecordingReportContext(ReportContext):
+    """report context keeping the reports"""
+
+    def __init__(self):
+        self.reports: list[ExecutionReport] = []
+
+    def update(self, report: ExecutionReport) -> None:
+        self.reports.append(report)
+
+
+def download_file(monkeypatch, expected_sha256, upload_status: int = 200):
+    """execute the download plugin with patched Databus and CMEM requests,
+    returns the report context and the deleted resources"""
+    content = b"SAMPLE CONTENT" * 1000
+    deleted = []
+
+    def upload(project_name, resource_name, file_resource, replace):
+        _ = project_name, resource_name, replace
+        with file_resource as stream:
+            assert b"".join(stream) == content
+        response = FakeResponse(b"", status_code=upload_status)
+        response.text = "upload failed"
+        return response
+
+    def sha256(endpoint, file_id):
+        _ = endpoint, file_id
+        if isinstance(expected_sha256, Exception):
+            raise expected_sha256
+        return expected_sha256
+
+    monkeypatch.setattr(loader, "setup_cmempy_user_access", lambda user: None)
+    monkeypatch.setattr(loader.SESSION, "get", lambda url, **_: FakeResponse(content))
+    monkeypatch.setattr(loader, "create_resource", upload)
+    monkeypatch.setattr(
+        loader, "delete_resource", lambda **kwargs: deleted.append(kwargs)
+    )
+    monkeypatch.setattr(loader, "fetch_databus_file_sha256", sha256)
+    context = TestExecutionContext(project_id="project")
+    context.report = RecordingReportContext()
+    SimpleDatabusLoadingPlugin(
+        databus_file_id=DATABUS_FILE, target_file="file.md", chunk_size=1000
+    ).execute(context=context)
+    return context.report.reports[-1], deleted
+
+
+def test_databus_load_checksum(monkeypatch):
+    """test the validation of the downloaded file against the published checksum"""
+    content_sha256 = hashlib.sha256(b"SAMPLE CONTENT" * 1000).hexdigest()
+    report, deleted = download_file(monkeypatch, content_sha256)
+    assert report.operation_desc == "Download Successful ✓"
+    assert not deleted
+
+    report, deleted = download_file(monkeypatch, "0" * 64)
+    assert report.operation_desc == "Download Failed ❌"
+    assert "checksum mismatch" in report.error
+    assert deleted == [{"project_name": "project", "resource_name": "file.md"}]
+
+    # the checksum is optional, unexpected lookup errors do not fail the task
+    report, deleted = download_file(monkeypatch, KeyError("sha256sum"))
+    assert report.operation_desc == "Download Successful ✓"
+
+    # a failed upload is reported as such and nothing is deleted
+    report, deleted = download_file(monkeypatch, "0" * 64, upload_status=500)
+    assert report.error == "upload failed"
+    assert not deleted
+
+
+def test_get_resources_cache(monkeypatch):
+    """test that resources are cached per user, but not without a user"""
+    calls = []
+
+    def get_resources(project_id):
+        calls.append(project_id)
+        return [{"fullPath": "file.txt", "name": "file.txt"}]
+
+    monkeypatch.setattr(parameter_types, "get_resources", get_resources)
+    clear_databus_cache()
+    assert _get_resources("project", None) == {"file.txt": "file.txt"}
+    _get_resources("project", None)
+    assert len(calls) == 2
+    _get_resources("project", "urn:user")
+    _get_resources("project", "urn:user")
+    assert len(calls) == 3
+    _get_resources("project", "urn:other")
+    assert len(calls) == 4
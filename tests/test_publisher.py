@@ -0,0 +1,169 @@
+"""Publisher tests."""
+import gzip
+from dataclasses import dataclass
+from typing import Optional
+from unittest.mock import Mock
+
+import pytest
+
+from cmem_plugin_databus import publisher
+from cmem_plugin_databus.publisher import (
+    LICENSES,
+    DatabusDeployPlugin,
+    _generate_abstract_from_description,
+    _gzip_chunks,
+    validate_dataset_artifact_uri,
+)
+from cmem_plugin_databus.utils import WebDAVException
+from .utils import TestExecutionContext
+
+
+def test_validate_dataset_artifact_uri():
+    """test the validation of dataset artifact URIs"""
+    assert validate_dataset_artifact_uri("https://databus.example.org/user/group/art/")
+    assert validate_dataset_artifact_uri("http://databus.example.org/user/group/art")
+    assert not validate_dataset_artifact_uri("https://databus.example.org/user/group/")
+    assert not validate_dataset_artifact_uri("https://databus.example.org/u/g/a/1.0/")
+    assert not validate_dataset_artifact_uri("databus.example.org/user/group/art/")
+
+
+def test_generate_abstract_from_description():
+    """test that the abstract is the first sentence of the description"""
+    assert _generate_abstract_from_description("One. Two.") == "One."
+    assert _generate_abstract_from_description("No point") == "No point"
+    assert _generate_abstract_from_description("") == ""
+
+
+def test_gzip_chunks():
+    """test that the compressed chunks form a valid gzip file"""
+    chunks = [b"<urn:a> <urn:b> <urn:c> .\n" * 1000] * 3
+    compressed = b"".join(_gzip_chunks(iter(chunks)))
+    assert gzip.decompress(compressed) == b"".join(chunks)
+    assert len(compressed) < len(chunks[0])
+
+
+TURTLE = b"<urn:a> <urn:b> <urn:c> .\n" * 100
+
+GRAPH_TASK = {
+    "data": {"parameters": {"graph": {"value": "urn:graph"}}},
+    "metadata": {"label": "Graph", "description": "A graph. With triples."},
+}
+
+
+class FakeRaw:
+    """raw response yielding the graph in chunks"""
+
+    def stream(self, amt, decode_content=None):
+        """yield the graph in chunks"""
+        _ = decode_content
+        for i in range(0, len(TURTLE), amt):
+            yield TURTLE[i:i + amt]
+
+
+class FakeGraphResponse:
+    """streamed graph response"""
+
+    raw = FakeRaw()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+@dataclass
+class FakeUploadResponse:
+    """WebDAV PUT response"""
+
+    status_code: int
+
+
+def deploy_plugin(
+    monkeypatch, compression: str = "none", task: Optional[dict] = None
+) -> tuple[dict, dict, list]:
+    """execute a deploy plugin without CMEM and Databus,
+    returns the uploaded files, the deployed dataset and the created directories"""
+    plugin = DatabusDeployPlugin(
+        dataset_artifact_uri="https://databus.example.org/user/group/art/",
+        version="1.0",
+        license_uri=next(iter(LICENSES)),
+        api_key="key",
+        source_dataset="graph",
+        cvs="type=test",
+        chunk_size=512,
+        compression=compression,
+    )
+    uploads: dict = {}
+    deployed: dict = {}
+    created: list = []
+
+    def upload(path, data, context, chunk_size):
+        _ = context, chunk_size
+        uploads[path] = b"".join(data)
+        return FakeUploadResponse(201)
+
+    monkeypatch.setattr(publisher, "setup_cmempy_super_user_access", lambda: None)
+    monkeypatch.setattr(publisher, "get_task", lambda **_: task or GRAPH_TASK)
+    monkeypatch.setattr(
+        publisher, "get_streamed", lambda uri, accept: FakeGraphResponse()
+    )
+    monkeypatch.setattr(
+        publisher, "deploy", lambda dataset, api_key: deployed.update(dataset)
+    )
+    monkeypatch.setattr(
+        plugin.webdav_handler, "create_dirs", lambda path: created.append(path)
+    )
+    monkeypatch.setattr(plugin.webdav_handler, "upload_file_with_context", upload)
+    plugin.execute(context=TestExecutionContext())
+    return uploads, deployed, created
+
+
+def test_deploy_gzip(monkeypatch):
+    """test that the gzip distribution matches the uploaded file"""
+    uploads, deployed, _ = deploy_plugin(monkeypatch, "gz")
+    assert list(uploads) == ["group/art/1.0/art_type=test.ttl.gz"]
+    assert gzip.decompress(uploads["group/art/1.0/art_type=test.ttl.gz"]) == TURTLE
+    distribution = deployed["@graph"][1]["distribution"][0]
+    assert distribution["compression"] == "gz"
+    assert distribution["file"] == (
+        "https://databus.example.org/user/group/art/1.0/art_type=test.ttl.gz"
+    )
+    assert distribution["downloadURL"] == (
+        "https://databus.example.org/dav/user/group/art/1.0/art_type=test.ttl.gz"
+    )
+
+
+def test_deploy_missing_metadata(monkeypatch):
+    """test that no directories are created for a graph without metadata"""
+    task = {"data": GRAPH_TASK["data"], "metadata": {"label": "Graph"}}
+    uploads, deployed, created = deploy_plugin(monkeypatch, task=task)
+    assert not uploads and not deployed and not created
+    _, _, created = deploy_plugin(monkeypatch)
+    assert created == ["group/art/1.0"]
+
+
+def test_deploy_graph_request_error(monkeypatch):
+    """test that a failed graph request is not masked by a WebDAV error"""
+    plugin = DatabusDeployPlugin(
+        dataset_artifact_uri="https://databus.example.org/user/group/art/",
+        version="1.0",
+        license_uri=next(iter(LICENSES)),
+        api_key="key",
+        source_dataset="graph",
+        cvs="type=test",
+        chunk_size=512,
+    )
+
+    def create_dirs(path):
+        raise WebDAVException(Mock(status_code=403))
+
+    def get_streamed(uri, accept):
+        raise ConnectionError("CMEM is not reachable")
+
+    monkeypatch.setattr(plugin.webdav_handler, "create_dirs", create_dirs)
+    monkeypatch.setattr(publisher, "get_streamed", get_streamed)
+    with pytest.raises(ConnectionError):
+        plugin._upload_graph(  # pylint: disable=protected-access
+            "urn:graph", "group/art/1.0/art.ttl", TestExecutionContext()
+        )
@@ -1,5 +1,7 @@
 """Testing utilities."""
 import os
+from time import monotonic
+from typing import ClassVar, Optional
 
 import pytest
 
@@ -24,15 +26,26 @@ class TestUserContext(UserContext):
 
     __test__ = False
     default_credential: dict = {}
+    # access token and the monotonic time until it is used, shared by all contexts
+    cached_token: ClassVar[Optional[tuple[str, float]]] = None
+    # seconds before the expiry of the token, from which on a new one is fetched
+    token_expiry_margin: ClassVar[float] = 30
 
-    def __init__(self):
-        # get access token from default service account
+    def token(self) -> str:
+        """get access token from default service account on first use"""
         if not TestUserContext.default_credential:
             TestUserContext.default_credential = get_oauth_default_credentials()
-        access_token = get_token(_oauth_credentials=TestUserContext.default_credential)[
-            "access_token"
-        ]
-        self.token = lambda: access_token
+        cached = TestUserContext.cached_token
+        if cached is None or monotonic() >= cached[1]:
+            fetched_at = monotonic()
+            token = get_token(_oauth_credentials=TestUserContext.default_credential)
+            valid_until = (
+                fetched_at
+                + float(token.get("expires_in", 60))
+                - TestUserContext.token_expiry_margin
+            )
+            cached = TestUserContext.cached_token = (token["access_token"], valid_until)
+        return cached[0]
 
 
 class TestPluginContext(PluginContext):